@@ -0,0 +1,268 @@
+import asyncio
+import json
+import math
+import os
+import ssl
+import sys
+import time
+from urllib.parse import urlsplit
+
+try:
+  from dotenv import load_dotenv
+except ImportError as ie:
+  print(f'Error importing modules: {ie}')
+  print('Please make sure you have run `pip install -r requirements.txt`')
+  sys.exit(1)
+
+# the compose app publishes container port 80, same as the task definition
+DEFAULT_URL = 'http://localhost:80/'
+DEFAULT_RESULTS_FILE = 'bench_results.jsonl'
+# upper bounds of the latency histogram buckets in milliseconds
+HISTOGRAM_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+# backoff after consecutive errors so an unreachable target isn't hammered in a tight loop
+ERROR_BACKOFF = 0.05
+MAX_ERROR_BACKOFF = 1.0
+
+class HttpConnection:
+  """
+  Minimal keep-alive HTTP/1.1 client on asyncio streams
+  """
+  def __init__(self, url, timeout):
+    parts = urlsplit(url)
+    self.host = parts.hostname
+    self.tls = parts.scheme == 'https'
+    self.port = parts.port or (443 if self.tls else 80)
+    self.path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+    self.timeout = timeout
+    self.reader = None
+    self.writer = None
+    host_header = self.host if parts.port is None else f'{self.host}:{self.port}'
+    self.request = f'GET {self.path} HTTP/1.1\r\nHost: {host_header}\r\nConnection: keep-alive\r\n\r\n'.encode()
+
+  async def connect(self):
+    ssl_context = ssl.create_default_context() if self.tls else None
+    self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=ssl_context)
+
+  async def close(self):
+    if self.writer is not None:
+      self.writer.close()
+      try:
+        await self.writer.wait_closed()
+      except Exception:
+        pass
+    self.reader = self.writer = None
+
+  async def _read_headers(self):
+    headers = {}
+    while True:
+      line = await self.reader.readline()
+      if line in (b'\r\n', b'\n', b''):
+        return headers
+      name, _, value = line.decode('latin-1').partition(':')
+      headers[name.strip().lower()] = value.strip()
+
+  async def _read_body(self, status, headers):
+    # these responses never have a body, whatever the headers say
+    if 100 <= status < 200 or status in (204, 304):
+      return
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+      while True:
+        size = int((await self.reader.readline()).split(b';')[0], 16)
+        await self.reader.readexactly(size + 2)
+        if size == 0:
+          return
+    elif 'content-length' in headers:
+      await self.reader.readexactly(int(headers['content-length']))
+    else:
+      # no length: the body ends when the server closes the connection
+      await self.reader.read()
+      await self.close()
+
+  async def _get(self):
+    if self.writer is None:
+      await self.connect()
+    self.writer.write(self.request)
+    await self.writer.drain()
+    status_line = await self.reader.readline()
+    if not status_line:
+      raise ConnectionError('connection closed by server')
+    status = int(status_line.split()[1])
+    headers = await self._read_headers()
+    # skip interim 1xx responses, the final response follows on the same connection
+    while 100 <= status < 200 and status != 101:
+      status_line = await self.reader.readline()
+      if not status_line:
+        raise ConnectionError('connection closed by server')
+      status = int(status_line.split()[1])
+      headers = await self._read_headers()
+    await self._read_body(status, headers)
+    if headers.get('connection', '').lower() == 'close':
+      await self.close()
+    return status
+
+  async def get(self):
+    """
+    Sends a GET request, reconnecting on errors
+
+    Returns:
+      the HTTP status code
+    """
+    try:
+      return await asyncio.wait_for(self._get(), self.timeout)
+    except Exception:
+      await self.close()
+      raise
+
+def percentile(sorted_values, pct):
+  """
+  Nearest rank percentile of an already sorted list
+  """
+  if not sorted_values:
+    return 0.0
+  rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+  return sorted_values[rank - 1]
+
+async def worker(url, timeout, deadline, remaining, results):
+  """
+  Sends requests over one connection until the deadline or request budget is used up
+  """
+  connection = HttpConnection(url, timeout)
+  consecutive_errors = 0
+  while time.monotonic() < deadline:
+    if remaining is not None:
+      if remaining[0] <= 0:
+        break
+      remaining[0] -= 1
+    start = time.perf_counter()
+    try:
+      status = await connection.get()
+      results['latencies'].append((time.perf_counter() - start) * 1000)
+      results['status'][status] = results['status'].get(status, 0) + 1
+      consecutive_errors = 0
+    except Exception as e:
+      results['errors'] += 1
+      error = type(e).__name__
+      results['error_types'][error] = results['error_types'].get(error, 0) + 1
+      await asyncio.sleep(max(0, min(MAX_ERROR_BACKOFF, ERROR_BACKOFF * 2 ** consecutive_errors, deadline - time.monotonic())))
+      consecutive_errors += 1
+  await connection.close()
+
+async def run_load(url, concurrency, duration, requests, timeout):
+  """
+  Drives concurrent keep-alive GET requests against url
+
+  Args:
+    url (string): the target URL
+    concurrency (int): number of concurrent connections
+    duration (float): seconds to run for
+    requests (int): total number of requests, or None to run for the full duration
+    timeout (float): per request timeout in seconds
+
+  Returns:
+    the raw results dict and the elapsed time in seconds
+  """
+  results = {'latencies': [], 'status': {}, 'errors': 0, 'error_types': {}}
+  remaining = [requests] if requests else None
+  start = time.monotonic()
+  deadline = start + duration
+  await asyncio.gather(*[worker(url, timeout, deadline, remaining, results) for _ in range(concurrency)])
+  return results, time.monotonic() - start
+
+def summarize(args, results, elapsed):
+  """
+  Builds the stored summary of a run: throughput, percentiles and histogram
+  """
+  latencies = sorted(results['latencies'])
+  histogram = {}
+  for bucket in HISTOGRAM_BUCKETS:
+    histogram[f'<={bucket}ms'] = 0
+  histogram[f'>{HISTOGRAM_BUCKETS[-1]}ms'] = 0
+  for latency in latencies:
+    for bucket in HISTOGRAM_BUCKETS:
+      if latency <= bucket:
+        histogram[f'<={bucket}ms'] += 1
+        break
+    else:
+      histogram[f'>{HISTOGRAM_BUCKETS[-1]}ms'] += 1
+
+  return {
+    'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+    'label': args.label,
+    'url': args.url,
+    'concurrency': args.concurrency,
+    'duration': round(elapsed, 2),
+    'requests': len(latencies),
+    'errors': results['errors'],
+    'error_types': results['error_types'],
+    'status': {str(status): count for status, count in sorted(results['status'].items())},
+    'throughput': round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+    'p50': round(percentile(latencies, 50), 2),
+    'p95': round(percentile(latencies, 95), 2),
+    'p99': round(percentile(latencies, 99), 2),
+    'max': round(latencies[-1], 2) if latencies else 0.0,
+    'histogram': histogram,
+  }
+
+def print_summary(summary):
+  print(f'{summary["label"]}: {summary["url"]} x{summary["concurrency"]} for {summary["duration"]}s')
+  print(f'  requests:   {summary["requests"]} ({summary["errors"]} errors) status: {summary["status"]}')
+  print(f'  throughput: {summary["throughput"]} req/s')
+  print(f'  latency:    p50 {summary["p50"]}ms  p95 {summary["p95"]}ms  p99 {summary["p99"]}ms  max {summary["max"]}ms')
+  total = max(summary['requests'], 1)
+  for bucket, count in summary['histogram'].items():
+    print(f'  {bucket:>9} {count:>8} ' + '#' * round(40 * count / total))
+
+def print_comparison(results_file):
+  """
+  Prints the stored runs side by side so task sizes can be compared
+  """
+  if not os.path.exists(results_file):
+    print(f'No results found in {results_file}')
+    return
+  with open(results_file, 'r') as f:
+    runs = [json.loads(line) for line in f if line.strip()]
+  print(f'{"time":<20} {"label":<16} {"conc":>5} {"req/s":>9} {"p50":>8} {"p95":>8} {"p99":>8} {"errors":>7}')
+  for run in runs:
+    print(f'{run["time"]:<20} {run["label"]:<16} {run["concurrency"]:>5} {run["throughput"]:>9} {run["p50"]:>8} {run["p95"]:>8} {run["p99"]:>8} {run["errors"]:>7}')
+
+def run_bench(logger, args):
+  """
+  Runs the load test, prints the throughput/latency summary and appends it to the results file
+
+  Args:
+    logger (logger): the logger object
+    args (argparse object): the bench args (url/concurrency/duration/requests/timeout/label/output/compare)
+
+  Returns:
+    returns 0 on success, or -1 on failure
+  """
+  load_dotenv()
+  results_file = args.output or os.getenv('BENCH_RESULTS_FILE', DEFAULT_RESULTS_FILE)
+  if args.compare:
+    print_comparison(results_file)
+    return 0
+
+  if args.label is None:
+    # label deployed runs with the task sizing profile so they can be compared,
+    # the local compose app doesn't use it
+    if args.url is None:
+      args.label = 'local'
+    else:
+      args.label = f'{os.getenv("TASK_PROFILE", "remote")}@{urlsplit(args.url).hostname}'
+  if args.url is None:
+    args.url = DEFAULT_URL
+
+  logger.info(f'Benchmarking {args.url} with {args.concurrency} connections for {args.duration}s')
+  results, elapsed = asyncio.run(run_load(args.url, args.concurrency, args.duration, args.requests, args.timeout))
+  summary = summarize(args, results, elapsed)
+  print_summary(summary)
+
+  # a run against an unreachable target would only add a junk row to the comparison
+  if not summary['requests']:
+    logger.error(f'No successful requests to {args.url}: {summary["error_types"]}. Results not stored')
+    return -1
+
+  with open(results_file, 'a') as f:
+    f.write(json.dumps(summary) + '\n')
+  logger.info(f'Results appended to {results_file}')
+  return 0
\ No newline at end of file
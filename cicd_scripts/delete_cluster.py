@@ -11,58 +11,84 @@ except ImportError as ie:
   sys.exit(1)
   
 import launch_utils
+import rate_scheduler
+import teardown_journal
+
+# returned when a keep_alive cluster is left running without --force
+SKIPPED = 1
 
 def stop_and_delete_cluster(logger, params):
   """
   Deletes the cluster/service associated with params['cluster_name']
+  Completed steps are written to the teardown journal, so a --resume run
+  skips the API calls that already succeeded
 
   Args:
     logger (logger): the logger object
     params (dict): the configuration/env params with username/cluster_name/etc
 
   Returns:
-    returns 0 on success, or -1 on failure
+    returns 0 on success, SKIPPED for a keep_alive cluster without --force, or -1 on failure
   """
   # Cluster/Service/Task client
-  ecs = boto3.client('ecs', region_name='{{aws_region}}')
+  ecs = rate_scheduler.client('ecs')
   # clean clusters
   cluster_name = params["cluster_name"]
+  journal = teardown_journal.get_journal(logger, params)
   clusters = []
-  try:
-    response = ecs.describe_clusters(
-      clusters=[cluster_name],
-      include=['TAGS']
-    )
-    clusters = response['clusters']
-    logger.debug(response)
-  except Exception as e:
-    logger.error(f'Error describing clusters: {e}')
-    return -1
-  
-  if len(clusters):
-    cluster = response['clusters'][0]
-    logger.debug(f'{cluster["clusterName"]} {cluster["tags"]}')
-    if {'key': 'keep_alive', 'value': 'true'} in cluster['tags']:
-      if params["force"]:
-        logger.info(f'Force stopping: {cluster["clusterName"]}')
-      else:
-        logger.warning(f'{cluster["clusterName"]} has keepAlive enabled. Use --force to override.')  
-        return -1
-    
-    service_arns = []
+  if teardown_journal.is_done(journal, 'cluster_deleted'):
+    logger.info(f'Resuming: {cluster_name} was already deleted')
+  elif teardown_journal.is_done(journal, 'cluster_checked'):
+    logger.info(f'Resuming: {cluster_name} was already checked, skipping describe')
+    clusters = [{'clusterName': cluster_name}]
+  else:
     try:
-      response = ecs.list_services(
-        cluster=cluster_name,
-        launchType='FARGATE'
+      response = ecs.describe_clusters(
+        clusters=[cluster_name],
+        include=['TAGS']
       )
-      service_arns = response['serviceArns']
+      clusters = response['clusters']
       logger.debug(response)
-      logger.info(f'Service ARNs: {service_arns}')
     except Exception as e:
-      logger.error(f'Error listing services: {e}')
+      logger.error(f'Error describing clusters: {e}')
       return -1
     
+    if len(clusters):
+      cluster = response['clusters'][0]
+      logger.debug(f'{cluster["clusterName"]} {cluster["tags"]}')
+      if {'key': 'keep_alive', 'value': 'true'} in cluster['tags']:
+        if params["force"]:
+          logger.info(f'Force stopping: {cluster["clusterName"]}')
+        else:
+          logger.warning(f'{cluster["clusterName"]} has keepAlive enabled. Use --force to override.')  
+          return SKIPPED
+      teardown_journal.record_step(logger, journal, 'cluster_checked')
+    else:
+      logger.warning(f'No clusters found matching {cluster_name}')
+  
+  if len(clusters):
+    service_arns = []
+    if teardown_journal.is_done(journal, 'services_listed'):
+      service_arns = teardown_journal.get_data(journal, 'services_listed')
+      logger.info(f'Resuming: Service ARNs: {service_arns}')
+    else:
+      try:
+        # no launchType filter: services using a capacity provider strategy have none
+        response = ecs.list_services(
+          cluster=cluster_name
+        )
+        service_arns = response['serviceArns']
+        logger.debug(response)
+        logger.info(f'Service ARNs: {service_arns}')
+        teardown_journal.record_step(logger, journal, 'services_listed', data=service_arns)
+      except Exception as e:
+        logger.error(f'Error listing services: {e}')
+        return -1
+    
     for service in service_arns:
+      if teardown_journal.is_done(journal, 'service_deleted', service):
+        logger.info(f'Resuming: {service} was already deleted')
+        continue
       try:
         logger.info(f'Deleting service: {service}')
         response = ecs.delete_service(
@@ -71,8 +97,9 @@ def stop_and_delete_cluster(logger, params):
           force=True
         )
         logger.debug(response)
+        teardown_journal.record_step(logger, journal, 'service_deleted', service)
       except Exception as e:  
-        logger.error(f'Error deleting {service}: ', e)
+        logger.error(f'Error deleting {service}: {e}')
         return -1
     
     try:
@@ -81,6 +108,7 @@ def stop_and_delete_cluster(logger, params):
         cluster=cluster_name
       )
       logger.debug(response)
+      teardown_journal.record_step(logger, journal, 'cluster_deleted')
     except ecs.exceptions.ClusterContainsTasksException as e:
       # Wait for tasks to stop, then delete the cluster
       logger.info(f'Waiting for {cluster_name} tasks to stop')
@@ -95,15 +123,13 @@ def stop_and_delete_cluster(logger, params):
           cluster=cluster_name
         )
         logger.debug(response)
+        teardown_journal.record_step(logger, journal, 'cluster_deleted')
       except Exception as e:
-        logger.error('Error while waiting for tasks to stop: ', e)
+        logger.error(f'Error while waiting for tasks to stop: {e}')
         return -1
     except Exception as e:
-      logger.error('Error deleting cluster: ', e)
+      logger.error(f'Error deleting cluster: {e}')
       return -1
-      
-  else:
-    logger.warning(f'No clusters found matching {cluster_name}')
   
   # cluster deleted; proceed with cleanup
   cleanup_task_definitions(logger, params)
@@ -113,6 +139,7 @@ def stop_and_delete_cluster(logger, params):
 def cleanup_task_definitions(logger, params):
   """
   Deregisters/deletes task definitions associated with the params['cluster_name']
+  Revisions already deregistered/deleted according to the teardown journal are skipped
 
   Args:
     logger (logger): the logger object
@@ -122,49 +149,66 @@ def cleanup_task_definitions(logger, params):
     returns 0 on success, or -1 on failure
   """
   # Cluster/Service/Task client
-  ecs = boto3.client('ecs', region_name='{{aws_region}}')
+  ecs = rate_scheduler.client('ecs')
   
   cluster_name = params["cluster_name"]
+  journal = teardown_journal.get_journal(logger, params)
+  if teardown_journal.is_done(journal, 'task_definitions_cleaned'):
+    logger.info(f'Resuming: task definitions for {cluster_name} were already cleaned')
+    return 0
+  
   task_definitions = []  
   # clean task definitions
-  try:
-    response = ecs.list_task_definitions(
-      familyPrefix=cluster_name
-    )
-    task_definitions = response['taskDefinitionArns']
-    logger.info(f'Task Definitions: {task_definitions}')
-    logger.debug(response)
-  except Exception as e:
-    logger.error(f'Error listing task definitions: {e}')
-    return -1
+  if teardown_journal.is_done(journal, 'task_definitions_listed'):
+    task_definitions = teardown_journal.get_data(journal, 'task_definitions_listed')
+    logger.info(f'Resuming: Task Definitions: {task_definitions}')
+  else:
+    try:
+      response = ecs.list_task_definitions(
+        familyPrefix=cluster_name
+      )
+      task_definitions = response['taskDefinitionArns']
+      logger.info(f'Task Definitions: {task_definitions}')
+      logger.debug(response)
+      teardown_journal.record_step(logger, journal, 'task_definitions_listed', data=task_definitions)
+    except Exception as e:
+      logger.error(f'Error listing task definitions: {e}')
+      return -1
   
   if len(task_definitions):
     logger.info(f'Task Definitions: {task_definitions}')
     error = False
     for task in task_definitions:
+      if teardown_journal.is_done(journal, 'revision_deregistered', task):
+        continue
       try:
         logger.info(f'Deregistering {task}')
         response = ecs.deregister_task_definition(
           taskDefinition=task
         )
         logger.debug(response)
+        teardown_journal.record_step(logger, journal, 'revision_deregistered', task)
       except Exception as e:
         logger.error(f'Error deregistering task definition: {e}')
         return -1
     
+    remaining = [task for task in task_definitions if not teardown_journal.is_done(journal, 'revision_deleted', task)]
     try:
-      logger.info(f'Deleting task definitions: {task_definitions}')
+      logger.info(f'Deleting task definitions: {remaining}')
       # ecs.delete_task_definitions has a max of 10 at a time
-      for i in range(0, len(task_definitions), 10):
+      for i in range(0, len(remaining), 10):
         # get batch slice
-        batch = task_definitions[i:i+10]
+        batch = remaining[i:i+10]
         response = ecs.delete_task_definitions(
           taskDefinitions=batch
         )
         logger.debug(response)
+        for task in batch:
+          teardown_journal.record_step(logger, journal, 'revision_deleted', task)
     except Exception as e:
       logger.error(f'Error deleting task definitions: {e}')
       return -1
+  teardown_journal.record_step(logger, journal, 'task_definitions_cleaned')
   return 0
 
 ############################################################
@@ -179,9 +223,14 @@ def clean_ECR(logger, params):
   """
   
   # ECR repo client
-  ecr = boto3.client('ecr', region_name='{{aws_region}}')
+  ecr = rate_scheduler.client('ecr')
   
   cluster_name = params["cluster_name"]
+  journal = teardown_journal.get_journal(logger, params)
+  if teardown_journal.is_done(journal, 'repo_removed'):
+    logger.info(f'Resuming: repository {cluster_name} was already removed')
+    return
+  
   repositories = []
   response = None
   try:
@@ -193,6 +242,7 @@ def clean_ECR(logger, params):
     repositories = response['repositories'][0]
   except ecr.exceptions.RepositoryNotFoundException as e:
     logger.warning(f'The repository {cluster_name} does not exist')
+    teardown_journal.record_step(logger, journal, 'repo_removed')
   except Exception as e:
     logger.error(f'Error describing repositories: {e}')
     
@@ -204,6 +254,7 @@ def clean_ECR(logger, params):
         force=True
       )
       logger.debug(response)
+      teardown_journal.record_step(logger, journal, 'repo_removed')
     except Exception as e:
       logger.error(f'Error deleting repository: {e}')
 
@@ -211,50 +262,96 @@ def delete_cluster(logger, params):
   """
   Deletes the cluster specified by params['cluster_name']
   Will also deregister task definitons, and clean up the ECR repo
+  The teardown journal is removed once every step has completed
 
   Args:
     logger (logger): the logger object
     params (dict): the configuration/env params with username/cluster_name/etc
+  
+  Returns:
+    returns 0 on success, SKIPPED for a keep_alive cluster without --force, or -1 on failure
   """
   
-  if stop_and_delete_cluster(logger, params) == 0:
+  journal = teardown_journal.get_journal(logger, params)
+  result = stop_and_delete_cluster(logger, params)
+  if result == SKIPPED:
+    # nothing was torn down, so there is nothing to resume
+    teardown_journal.close_journal(logger, journal)
+    return SKIPPED
+  if result == 0:
     clean_ECR(logger, params)
+  
+  if teardown_journal.is_done(journal, 'task_definitions_cleaned') and teardown_journal.is_done(journal, 'repo_removed'):
+    teardown_journal.close_journal(logger, journal)
+    return 0
+  logger.warning(f'Teardown of {params["cluster_name"]} incomplete. Run again with --resume to continue')
+  return -1
 
 
 def delete_all_clusters(logger, params):
   """
   Deletes all clusters with the tag: {'key': 'creator', 'value': username}
+  The identified clusters are journaled, so a --resume run skips listing the account
 
   Args:
     logger (logger): the logger object
     params (dict): the configuration/env params with username/cluster_name/etc
+  
+  Returns:
+    returns 0 on success, or -1 if any teardown is incomplete
   """
   
-  ecs = boto3.client('ecs', region_name='{{aws_region}}')
+  ecs = rate_scheduler.client('ecs')
+  
+  journal = teardown_journal.open_journal(logger, f'stopall-{params["local_username"]}', params.get('resume', False))
   
-  response = []
-  try:
-    response = ecs.list_clusters()
-    logger.debug(response)
-    response = ecs.describe_clusters(
-      clusters=response['clusterArns'],
-      include=['TAGS']
-    )
-    logger.debug(response)
-  except Exception as e:
-    logger.error(f'Error listing clusters: {e}')
-
   clusters = []
-  for cluster in response['clusters']:
-    logger.debug(cluster['tags'])
-    if {'key': 'creator', 'value': params['local_username']} in cluster['tags']:
-      clusters.append(cluster)  
-  logger.info(f'Identified the following clusters: {clusters}')
+  if teardown_journal.is_done(journal, 'clusters_identified'):
+    clusters = teardown_journal.get_data(journal, 'clusters_identified')
+    logger.info(f'Resuming: identified the following clusters: {clusters}')
+  else:
+    response = []
+    try:
+      response = ecs.list_clusters()
+      logger.debug(response)
+      response = ecs.describe_clusters(
+        clusters=response['clusterArns'],
+        include=['TAGS']
+      )
+      logger.debug(response)
+    except Exception as e:
+      logger.error(f'Error listing clusters: {e}')
+
+    for cluster in response['clusters']:
+      logger.debug(cluster['tags'])
+      if {'key': 'creator', 'value': params['local_username']} in cluster['tags']:
+        clusters.append(cluster['clusterName'])  
+    logger.info(f'Identified the following clusters: {clusters}')
+    teardown_journal.record_step(logger, journal, 'clusters_identified', data=clusters)
   
-  for cluster in clusters:
-    logger.info(f'Deleting Cluster: {cluster["clusterName"]}')
-    params['cluster_name'] = cluster['clusterName']
-    delete_cluster(logger, params)
+  error = False
+  for cluster_name in clusters:
+    if teardown_journal.is_done(journal, 'cluster_torn_down', cluster_name):
+      logger.info(f'Resuming: {cluster_name} was already torn down')
+      continue
+    if teardown_journal.is_done(journal, 'cluster_skipped', cluster_name):
+      logger.info(f'Resuming: {cluster_name} was skipped (keepAlive)')
+      continue
+    logger.info(f'Deleting Cluster: {cluster_name}')
+    params['cluster_name'] = cluster_name
+    result = delete_cluster(logger, params)
+    if result == 0:
+      teardown_journal.record_step(logger, journal, 'cluster_torn_down', cluster_name)
+    elif result == SKIPPED:
+      teardown_journal.record_step(logger, journal, 'cluster_skipped', cluster_name)
+    else:
+      error = True
+  
+  if error:
+    logger.warning('stopall incomplete. Run again with --resume to continue')
+    return -1
+  teardown_journal.close_journal(logger, journal)
+  return 0
 
 
 if __name__ == "__main__":
@@ -265,6 +362,7 @@ if __name__ == "__main__":
   Args:
     -c, --cluster (string): the name of the cluster in ECS
     -f, --force (flag): enable force stop/delete mode
+    -r, --resume (flag): resume an interrupted teardown from its journal
     -t, --test (flag): enable test run, will print debug info
     -v (-vv) (flag): enable more verbose debugging info in the console
   
@@ -272,6 +370,7 @@ if __name__ == "__main__":
   parser = argparse.ArgumentParser(description="Script for deleting an ECS Cluster/Service/Task and the associated ECR image")
   parser.add_argument('-c', '--cluster', help="Name of Cluster to stop")
   parser.add_argument('-f', '--force', action='store_true', help="Force stop tasks with keepAlive enabled")
+  parser.add_argument('-r', '--resume', action='store_true', help="Resume an interrupted teardown, skipping completed steps")
   parser.add_argument('-t', '--test', action='store_true', help='Run in test mode')
   parser.add_argument('-v', '--verbose', action='count', help='Show more debugging messages')
   args = parser.parse_args()
@@ -286,4 +385,7 @@ if __name__ == "__main__":
     logger.info('Test mode exiting')
     sys.exit(0)
 
-  delete_cluster(logger, params)
\ No newline at end of file
+  result = delete_cluster(logger, params)
+  rate_scheduler.log_metrics(logger)
+  if result == -1:
+    sys.exit(1)
\ No newline at end of file
@@ -13,6 +13,7 @@ except ImportError as ie:
   sys.exit(1)
   
 import launch_utils
+import rate_scheduler
 
 def launch_cluster(logger, params):
   """
@@ -26,11 +27,36 @@ def launch_cluster(logger, params):
   create_cluster(logger, params)
   register_task_definition(logger, params)
   create_service(logger, params)
+  if params["autoscaling"]:
+    register_autoscaling(logger, params)
+
+# buildx builder used for multi-platform images
+BUILDX_BUILDER = 'easy-aws-multiarch'
+
+def get_buildx_builder(logger):
+  """
+  Finds or creates a docker-container buildx builder, which multi-platform
+  builds need (the default 'docker' driver only builds a single platform)
+  
+  Args:
+    logger (logger): the logger object
+  
+  Returns:
+    the builder name, or None if no multi-platform builder is available
+  """
+  result = subprocess.run(f'docker buildx inspect {BUILDX_BUILDER}', shell=False, capture_output=True, text=True)
+  if result.returncode != 0:
+    logger.info(f'Creating buildx builder: {BUILDX_BUILDER}')
+    result = subprocess.run(f'docker buildx create --name {BUILDX_BUILDER} --driver docker-container', shell=False, capture_output=True, text=True)
+    if result.returncode != 0:
+      logger.debug(result.stderr)
+      return None
+  return BUILDX_BUILDER
 
 # Create ECR repo
 def create_ECR_repo(logger, params):
   """
-  Creates an ECR repo, builds the docker container image, and pushes it
+  Creates an ECR repo, builds the (multi-arch) docker container image, and pushes it
   
   Args:
     logger (logger): the logger object
@@ -38,9 +64,9 @@ def create_ECR_repo(logger, params):
   """
   ecr_repo = params["ecr_repo"]
   ecr_uri = params["ecr_uri"]
-  local_container = params["local_container"]
+  image_platforms = params["image_platforms"]
 
-  ecr = boto3.client('ecr', region_name='{{aws_region}}')
+  ecr = rate_scheduler.client('ecr')
   try:
     response = ecr.create_repository(
       repositoryName=ecr_repo
@@ -56,7 +82,7 @@ def create_ECR_repo(logger, params):
   # Tag and Push docker to ECR
   try:
     session = boto3.Session(region_name='{{aws_region}}', profile_name='default')
-    client = session.client('ecr', region_name='{{aws_region}}')
+    client = rate_scheduler.client('ecr', session=session)
     
     response = client.get_authorization_token()
     
@@ -66,14 +92,17 @@ def create_ECR_repo(logger, params):
     login_cmd_str = f'docker login --username AWS --password {password} {ecr_uri}'
     subprocess.run(login_cmd_str, shell=False, check=True)
     
-    build_cmd_str = f'docker build -t {local_container} .'
+    # buildx pushes a multi-arch manifest list so the task can run on X86_64 or ARM64
+    builder_arg = ''
+    if ',' in image_platforms:
+      builder = get_buildx_builder(logger)
+      if builder is None:
+        image_platforms = launch_utils.CPU_ARCHITECTURES[params["cpu_architecture"]]
+        logger.warning(f'No multi-platform buildx builder available, building {image_platforms} only. Run `docker buildx create --use` to build all IMAGE_PLATFORMS')
+      else:
+        builder_arg = f'--builder {builder} '
+    build_cmd_str = f'docker buildx build {builder_arg}--platform {image_platforms} -t {ecr_uri}/{ecr_repo}:latest --push .'
     subprocess.run(build_cmd_str, shell=False, check=True)
-    
-    tag_cmd_str = f'docker tag {local_container} {ecr_uri}/{ecr_repo}:latest'
-    subprocess.run(tag_cmd_str, shell=False, check=True)
-    
-    push_cmd_str = f'docker push {ecr_uri}/{ecr_repo}:latest'
-    subprocess.run(push_cmd_str, shell=False, check=True)
   except Exception as e:
     logger.critical(f'Error occured while tagging/pushing Docker image: {e}')
     sys.exit()
@@ -82,7 +111,7 @@ def create_ECR_repo(logger, params):
 # Create the Cluster
 def create_cluster(logger, params):
   """
-  Creates the cluster and sets its tags
+  Creates the cluster and sets its tags and capacity providers
 
   Args:
     logger (logger): the logger object
@@ -90,19 +119,42 @@ def create_cluster(logger, params):
   """
   tags = params["tags"]
   cluster_name = params["cluster_name"]
+  capacity_provider_strategy = params["capacity_provider_strategy"]
 
-  ecs = boto3.client('ecs', region_name='{{aws_region}}')
+  ecs = rate_scheduler.client('ecs')
+  
+  capacity_args = {}
+  if capacity_provider_strategy:
+    capacity_args = {
+      'capacityProviders': [item['capacityProvider'] for item in capacity_provider_strategy],
+      'defaultCapacityProviderStrategy': capacity_provider_strategy
+    }
   
   try:
     response = ecs.create_cluster(
       tags=tags,
-      clusterName = cluster_name
+      clusterName = cluster_name,
+      **capacity_args
     )
     logger.info(f'Cluster created: {cluster_name}')
     logger.debug(response)
   except Exception as e:
     logger.critical(f'Error occured while creating cluster: {e}')
     sys.exit()
+  
+  # create_cluster returns an existing active cluster unchanged, so associate the
+  # providers explicitly or a redeploy with the strategy is rejected
+  if capacity_provider_strategy:
+    try:
+      response = ecs.put_cluster_capacity_providers(
+        cluster=cluster_name,
+        **capacity_args
+      )
+      logger.info(f'Capacity providers set: {capacity_args["capacityProviders"]}')
+      logger.debug(response)
+    except Exception as e:
+      logger.critical(f'Error occured while setting cluster capacity providers: {e}')
+      sys.exit()
 
 # Create the task definition
 def register_task_definition(logger, params):
@@ -114,7 +166,7 @@ def register_task_definition(logger, params):
     params (dict): the configuration/env params with username/cluster_name/etc
   """
 
-  ecs = boto3.client('ecs', region_name='{{aws_region}}')
+  ecs = rate_scheduler.client('ecs')
   
   tags = params["tags"]
   task_family_name = params["task_family_name"]
@@ -122,6 +174,10 @@ def register_task_definition(logger, params):
   task_execution_role_arn = params["task_execution_role_arn"]
   container_name = params["container_name"]
   image_uri = params["image_uri"]
+  task_cpu = params["task_cpu"]
+  task_memory = params["task_memory"]
+  cpu_architecture = params["cpu_architecture"]
+  container_port = params["container_port"]
   
   try:
     response = ecs.register_task_definition(
@@ -131,8 +187,12 @@ def register_task_definition(logger, params):
       executionRoleArn=task_execution_role_arn,
       networkMode='awsvpc',
       requiresCompatibilities=['FARGATE'],
-      cpu='512',
-      memory='1GB',
+      runtimePlatform={
+        'cpuArchitecture': cpu_architecture,
+        'operatingSystemFamily': 'LINUX'
+      },
+      cpu=task_cpu,
+      memory=task_memory,
       containerDefinitions=[
         {
         'name': container_name,
@@ -148,8 +208,8 @@ def register_task_definition(logger, params):
         },
         'portMappings': [
           {
-            'containerPort': 80,
-            'hostPort': 80,
+            'containerPort': container_port,
+            'hostPort': container_port,
             'protocol': 'tcp'
           }
         ],
@@ -173,7 +233,7 @@ def create_service(logger, params):
     params (dict): the configuration/env params with username/cluster_name/etc
   """
 
-  ecs = boto3.client('ecs', region_name='{{aws_region}}')
+  ecs = rate_scheduler.client('ecs')
   
   tags = params["tags"]
   cluster_name = params["cluster_name"]
@@ -181,6 +241,28 @@ def create_service(logger, params):
   task_family_name = params["task_family_name"]
   subnet = params["subnet"]
   security_group = params["security_group"]
+  desired_count = params["desired_count"]
+  capacity_provider_strategy = params["capacity_provider_strategy"]
+  target_group_arn = params["target_group_arn"]
+  
+  # register the tasks in the ALB target group if one is configured
+  load_balancer_args = {}
+  if target_group_arn:
+    load_balancer_args = {
+      'loadBalancers': [
+        {
+          'targetGroupArn': target_group_arn,
+          'containerName': params["container_name"],
+          'containerPort': params["container_port"]
+        }
+      ]
+    }
+  
+  # launchType and capacityProviderStrategy are mutually exclusive
+  if capacity_provider_strategy:
+    capacity_args = {'capacityProviderStrategy': capacity_provider_strategy}
+  else:
+    capacity_args = {'launchType': 'FARGATE'}
   
   try:
     response = ecs.create_service(
@@ -188,8 +270,9 @@ def create_service(logger, params):
       cluster=cluster_name,
       serviceName=service_name,
       taskDefinition=task_family_name,
-      desiredCount=1,
-      launchType='FARGATE',
+      desiredCount=desired_count,
+      **capacity_args,
+      **load_balancer_args,
       networkConfiguration={
         'awsvpcConfiguration': {
         'subnets': [
@@ -207,12 +290,21 @@ def create_service(logger, params):
   except Exception as e:
     # Check if service already exists
     if "Creation of service was not idempotent" in str(e):
+      # keep the count the autoscaler has reached when autoscaling is enabled
+      update_args = dict(load_balancer_args)
+      if not params["autoscaling"]:
+        update_args['desiredCount'] = desired_count
+      # switching capacity providers only takes effect with a new deployment
+      if capacity_provider_strategy:
+        update_args['capacityProviderStrategy'] = capacity_provider_strategy
+        update_args['forceNewDeployment'] = True
       try:
         # update to use latest task version
         response = ecs.update_service(
           cluster=cluster_name,
           service=service_name,
           taskDefinition=task_family_name,
+          **update_args,
   		propagateTags='SERVICE'
         )
         logger.info(f'Updated Service: {service_name}')
@@ -223,9 +315,79 @@ def create_service(logger, params):
       sys.exit()
 
 
+# Register target tracking autoscaling for the service
+def register_autoscaling(logger, params):
+  """
+  Registers the service as an Application Auto Scaling target and adds a
+  target tracking policy on CPU utilization or ALB request count per task
+  
+  Args:
+    logger (logger): the logger object
+    params (dict): the configuration/env params with username/cluster_name/etc
+  """
+
+  autoscaling_client = rate_scheduler.client('application-autoscaling')
+  
+  cluster_name = params["cluster_name"]
+  service_name = params["service_name"]
+  autoscaling = params["autoscaling"]
+  resource_id = f'service/{cluster_name}/{service_name}'
+  
+  if autoscaling["metric"] == 'cpu':
+    metric_specification = {
+      'PredefinedMetricType': 'ECSServiceAverageCPUUtilization'
+    }
+  
+  try:
+    if autoscaling["metric"] == 'requests':
+      resource_label = autoscaling["resource_label"]
+      if not resource_label:
+        # build app/<lb name>/<lb id>/targetgroup/<tg name>/<tg id> from the target group's load balancer
+        target_group_arn = params["target_group_arn"]
+        elbv2 = rate_scheduler.client('elbv2')
+        response = elbv2.describe_target_groups(TargetGroupArns=[target_group_arn])
+        logger.debug(response)
+        load_balancer_arn = response['TargetGroups'][0]['LoadBalancerArns'][0]
+        resource_label = f"{load_balancer_arn.split(':loadbalancer/')[1]}/{target_group_arn.split(':')[-1]}"
+      metric_specification = {
+        'PredefinedMetricType': 'ALBRequestCountPerTarget',
+        'ResourceLabel': resource_label
+      }
+    
+    response = autoscaling_client.register_scalable_target(
+      ServiceNamespace='ecs',
+      ResourceId=resource_id,
+      ScalableDimension='ecs:service:DesiredCount',
+      MinCapacity=autoscaling["min_capacity"],
+      MaxCapacity=autoscaling["max_capacity"]
+    )
+    logger.debug(response)
+    response = autoscaling_client.put_scaling_policy(
+      PolicyName=f'{service_name}-{autoscaling["metric"]}-target-tracking',
+      ServiceNamespace='ecs',
+      ResourceId=resource_id,
+      ScalableDimension='ecs:service:DesiredCount',
+      PolicyType='TargetTrackingScaling',
+      TargetTrackingScalingPolicyConfiguration={
+        'TargetValue': autoscaling["target"],
+        'PredefinedMetricSpecification': metric_specification,
+        'ScaleOutCooldown': 60,
+        'ScaleInCooldown': 300
+      }
+    )
+    logger.info(f'Autoscaling registered: {service_name} {autoscaling["metric"]} target {autoscaling["target"]} ({autoscaling["min_capacity"]}-{autoscaling["max_capacity"]} tasks)')
+    logger.debug(response)
+  except Exception as e:
+    logger.error(f'Error occured while registering autoscaling: {e}')
+
+
 if __name__ == "__main__":
   parser = argparse.ArgumentParser(description="Script for Launcing an ECS Cluster/Service/Task from an ECR Image from a Docker container")
   parser.add_argument('--keep-alive', action='store_true', help="Keep task alive. Use 'stop -f' to stop it")
+  parser.add_argument('-p', '--profile', help="Task sizing profile, e.g. small/medium/large/xlarge")
+  parser.add_argument('-a', '--autoscale', choices=['cpu', 'requests'], help="Register target tracking autoscaling on cpu or ALB request count")
+  parser.add_argument('--arch', choices=['X86_64', 'ARM64'], help="CPU architecture for the task")
+  parser.add_argument('--capacity-providers', help="Capacity provider strategy, e.g. FARGATE:1:1,FARGATE_SPOT:4 (provider:weight[:base])")
   parser.add_argument('-t', '--test', action='store_true', help='Run in test mode')
   parser.add_argument('-v', '--verbose', action='count', help='Show more debugging messages')
   args = parser.parse_args()
@@ -241,4 +403,5 @@ if __name__ == "__main__":
     logger.info('Test mode exiting')
     sys.exit(0)
 
-  launch_cluster(logger, params)
\ No newline at end of file
+  launch_cluster(logger, params)
+  rate_scheduler.log_metrics(logger)
\ No newline at end of file
@@ -17,6 +17,28 @@ except ImportError as ie:
   print('Please make sure you have run `pip install -r requirements.txt`')
   sys.exit(1)
 
+# Fargate task sizing profiles: name -> (cpu units, memory, desired count)
+# extra profiles can be defined in the .env file as TASK_PROFILE_<NAME>=<cpu>,<memory>,<desired count>
+TASK_PROFILES = {
+  'small': ('256', '512', 1),
+  'medium': ('512', '1GB', 1),
+  'large': ('1024', '2GB', 2),
+  'xlarge': ('2048', '4GB', 2),
+}
+DEFAULT_TASK_PROFILE = 'medium'
+
+# ECS cpuArchitecture -> docker build platform
+CPU_ARCHITECTURES = {
+  'X86_64': 'linux/amd64',
+  'ARM64': 'linux/arm64',
+}
+
+# default target values for the target tracking autoscaling metrics
+AUTOSCALING_TARGETS = {
+  'cpu': 70.0,
+  'requests': 1000.0,
+}
+
 def config_logger(args={'verbose': 1}):
   """
   Creates/configures a python logging object
@@ -139,10 +161,55 @@ def get_params(logger, args):
   
   project_version = os.getenv('PROJECT_VERSION', 'latest')
   
-  local_container = f'{container_name}:{project_version}'
   ecr_repo = f'{service_name}'
   image_uri = f'{ecr_uri}/{ecr_repo}:latest'.lower()
   
+  # optional ALB target group the service registers its tasks in
+  target_group_arn = os.getenv('TARGET_GROUP_ARN')
+  container_port = int(os.getenv('CONTAINER_PORT', 80))
+  
+  # sizing/autoscaling only matter when launching, don't let them block stop/stopall
+  task_profile = task_cpu = task_memory = desired_count = autoscaling = None
+  if hasattr(args, 'profile'):
+    task_profile = os.getenv('TASK_PROFILE', DEFAULT_TASK_PROFILE)
+    if args.profile is not None:
+      task_profile = args.profile
+    task_cpu, task_memory, desired_count = get_task_profile(logger, task_profile)
+  
+  if hasattr(args, 'autoscale'):
+    autoscaling = os.getenv('AUTOSCALING')
+    if args.autoscale is not None:
+      autoscaling = args.autoscale
+    if autoscaling:
+      autoscaling = get_autoscaling_config(logger, autoscaling, desired_count, target_group_arn)
+  
+  # architecture/capacity providers only matter when launching, don't let them block stop/stopall
+  cpu_architecture = image_platforms = capacity_providers = capacity_provider_strategy = None
+  if hasattr(args, 'arch'):
+    cpu_architecture = os.getenv('CPU_ARCHITECTURE', 'X86_64')
+    if args.arch is not None:
+      cpu_architecture = args.arch
+    cpu_architecture = cpu_architecture.upper()
+    if cpu_architecture not in CPU_ARCHITECTURES:
+      logger.critical(f'Unknown CPU architecture: {cpu_architecture}. Choose one of {list(CPU_ARCHITECTURES)}')
+      sys.exit(1)
+    image_platforms = os.getenv('IMAGE_PLATFORMS', ','.join(CPU_ARCHITECTURES.values()))
+    # the pushed image has to include the platform the task runs on
+    if CPU_ARCHITECTURES[cpu_architecture] not in [platform.strip() for platform in image_platforms.split(',')]:
+      logger.critical(f'IMAGE_PLATFORMS ({image_platforms}) does not include {CPU_ARCHITECTURES[cpu_architecture]} needed for {cpu_architecture} tasks')
+      sys.exit(1)
+  
+  if hasattr(args, 'capacity_providers'):
+    capacity_providers = os.getenv('CAPACITY_PROVIDER_STRATEGY')
+    if args.capacity_providers is not None:
+      capacity_providers = args.capacity_providers
+  if capacity_providers:
+    capacity_provider_strategy = get_capacity_provider_strategy(logger, capacity_providers)
+    # Fargate Spot only runs X86_64 tasks
+    if cpu_architecture == 'ARM64' and any(item['capacityProvider'] == 'FARGATE_SPOT' for item in capacity_provider_strategy):
+      logger.critical('FARGATE_SPOT does not support ARM64 tasks. Use FARGATE or CPU_ARCHITECTURE=X86_64')
+      sys.exit(1)
+  
   local_username = getpass.getuser()
   
   tags = [{'key': 'creator', 'value': local_username}]
@@ -162,8 +229,17 @@ def get_params(logger, args):
     'task_role_arn': task_role_arn,
     'task_execution_role_arn': task_execution_role_arn,
     'image_uri': image_uri,
-    'local_container': local_container,
     'local_username': local_username,
+    'task_profile': task_profile,
+    'task_cpu': task_cpu,
+    'task_memory': task_memory,
+    'desired_count': desired_count,
+    'autoscaling': autoscaling,
+    'target_group_arn': target_group_arn,
+    'container_port': container_port,
+    'cpu_architecture': cpu_architecture,
+    'image_platforms': image_platforms,
+    'capacity_provider_strategy': capacity_provider_strategy,
     'tags': tags
   }
   
@@ -172,6 +248,11 @@ def get_params(logger, args):
     logger.debug('Enabling --force mode')
     params["force"] = args.force
   
+  # check for -r/--resume
+  if hasattr(args, 'resume'):
+    logger.debug('Enabling --resume mode')
+    params["resume"] = args.resume
+  
   # update if user provided -c/--cluster
   if hasattr(args, 'cluster') and args.cluster is not None:
     logger.debug(f'Updating params["cluster_name"] to {args.cluster}')
@@ -187,6 +268,97 @@ def get_params(logger, args):
   
   return params
   
+def get_task_profile(logger, name):
+  """
+  Looks up a task sizing profile by name
+  
+  Args:
+    logger (logger): the logger object
+    name (string): the profile name, either built in (see TASK_PROFILES) or TASK_PROFILE_<NAME> in the .env file
+  
+  Returns:
+    a (cpu, memory, desired_count) tuple
+  """
+  custom_profile = os.getenv(f'TASK_PROFILE_{name.upper()}')
+  if custom_profile is not None:
+    try:
+      cpu, memory, desired_count = [value.strip() for value in custom_profile.split(',')]
+      profile = (cpu, memory, int(desired_count))
+    except ValueError:
+      logger.critical(f'TASK_PROFILE_{name.upper()} must be formatted as <cpu>,<memory>,<desired count>')
+      sys.exit(1)
+  elif name.lower() in TASK_PROFILES:
+    profile = TASK_PROFILES[name.lower()]
+  else:
+    logger.critical(f'Unknown task profile: {name}. Choose one of {list(TASK_PROFILES)} or define TASK_PROFILE_{name.upper()}')
+    sys.exit(1)
+  
+  return profile
+
+def get_autoscaling_config(logger, metric, desired_count, target_group_arn=None):
+  """
+  Builds the target tracking autoscaling config from the .env file
+  
+  Args:
+    logger (logger): the logger object
+    metric (string): the metric to track, 'cpu' or 'requests'
+    desired_count (int): the service desired count, used as the default minimum capacity
+    target_group_arn (string): the ALB target group the service is registered in, required for 'requests'
+  
+  Returns:
+    a dict with the metric/target/min/max capacity (and optional ALB resource label for 'requests')
+  """
+  metric = metric.lower()
+  if metric not in AUTOSCALING_TARGETS:
+    logger.critical(f'Unknown autoscaling metric: {metric}. Choose one of {list(AUTOSCALING_TARGETS)}')
+    sys.exit(1)
+  
+  autoscaling = {
+    'metric': metric,
+    'target': float(os.getenv('AUTOSCALING_TARGET', AUTOSCALING_TARGETS[metric])),
+    'min_capacity': int(os.getenv('AUTOSCALING_MIN', desired_count)),
+    'max_capacity': int(os.getenv('AUTOSCALING_MAX', max(desired_count, 1) * 4)),
+  }
+  
+  if metric == 'requests':
+    # the service has to serve the target group's traffic for its request count to scale it
+    if target_group_arn is None:
+      logger.critical('Request count autoscaling needs TARGET_GROUP_ARN so the service is registered in the target group')
+      sys.exit(1)
+    # app/<lb name>/<lb id>/targetgroup/<tg name>/<tg id>, looked up from the target group if not set
+    autoscaling['resource_label'] = os.getenv('AUTOSCALING_RESOURCE_LABEL')
+  
+  if autoscaling['min_capacity'] > autoscaling['max_capacity']:
+    logger.critical('AUTOSCALING_MIN must not be greater than AUTOSCALING_MAX')
+    sys.exit(1)
+  return autoscaling
+
+def get_capacity_provider_strategy(logger, strategy):
+  """
+  Parses a capacity provider strategy string, e.g. FARGATE:1:1,FARGATE_SPOT:4
+  
+  Args:
+    logger (logger): the logger object
+    strategy (string): comma separated provider:weight[:base] items
+  
+  Returns:
+    a list of capacity provider strategy items for ECS
+  """
+  items = []
+  for item in strategy.split(','):
+    parts = [part.strip() for part in item.split(':')]
+    try:
+      if len(parts) not in (2, 3):
+        raise ValueError(item)
+      strategy_item = {'capacityProvider': parts[0], 'weight': int(parts[1])}
+      if len(parts) == 3:
+        strategy_item['base'] = int(parts[2])
+    except ValueError:
+      logger.critical(f'Invalid capacity provider strategy item: {item}. Use provider:weight[:base], e.g. FARGATE:1:1')
+      sys.exit(1)
+    items.append(strategy_item)
+  return items
+
 def log_params(params, logger):
   """
   Prints the params values in an easier to read format
@@ -210,6 +382,5 @@ def log_params(params, logger):
   #logger.info(f'Task Role:              {params["task_role_arn"]}')
   #logger.info(f'Task Execution Role:    {params["task_execution_role_arn"]}')
   #logger.info(f'Image URI:              {params["image_uri"]}')
-  #logger.info(f'Local Container:        {params["local_container"]}')
   #logger.info(f'Local Username:         {params["local_username"]}')
   #logger.info(f'Tags:                   {params["tags"]}')
\ No newline at end of file
@@ -0,0 +1,225 @@
+import http.client
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+
+try:
+  import boto3
+  from botocore.config import Config
+  from dotenv import load_dotenv
+except ImportError as ie:
+  print(f'Error importing modules: {ie}')
+  print('Please make sure you have run `pip install -r requirements.txt`')
+  sys.exit(1)
+
+# host side endpoints of the docker-compose.yml services
+DEFAULT_DYNAMODB_ENDPOINT = 'http://localhost:8000'
+DEFAULT_S3_ENDPOINT = 'http://localhost:9090'
+DEFAULT_APP_PORT = 80
+# dummy credentials, same as the ones in docker-compose.yml
+LOCAL_CREDENTIALS = {
+  'aws_access_key_id': 'foo',
+  'aws_secret_access_key': 'bar',
+  'aws_session_token': 'dummy',
+}
+PROBE_INTERVAL = 0.25
+# fail fast so a probe that isn't listening yet doesn't hang the poll loop
+# s3mock only supports path style bucket addressing
+PROBE_CONFIG = Config(connect_timeout=1, read_timeout=2, retries={'max_attempts': 1}, s3={'addressing_style': 'path'})
+
+def local_client(service_name, endpoint_url, config=PROBE_CONFIG):
+  """
+  Creates a boto3 client for a local mock endpoint
+
+  Args:
+    service_name (string): 'dynamodb' or 's3'
+    endpoint_url (string): the local endpoint, e.g. http://localhost:8000
+    config (botocore Config): the client config, defaults to the fail fast PROBE_CONFIG
+  """
+  return boto3.client(service_name, endpoint_url=endpoint_url, region_name='us-east-1', config=config, **LOCAL_CREDENTIALS)
+
+def get_local_params(logger):
+  """
+  Loads the local stack settings from the .env file
+
+  Args:
+    logger (logger): the logger object
+
+  Returns:
+    A dict with the local endpoints/tables/buckets
+  """
+  load_dotenv()
+
+  params = {
+    'dynamodb_endpoint': os.getenv('LOCAL_DYNAMODB_ENDPOINT', DEFAULT_DYNAMODB_ENDPOINT),
+    's3_endpoint': os.getenv('LOCAL_S3_ENDPOINT', DEFAULT_S3_ENDPOINT),
+    'app_port': int(os.getenv('LOCAL_APP_PORT', DEFAULT_APP_PORT)),
+    # table[:hash key[:range key]] items, e.g. users:id,events:user_id:timestamp
+    'tables': [table for table in os.getenv('LOCAL_DYNAMODB_TABLES', '').split(',') if table],
+    'buckets': [bucket for bucket in os.getenv('LOCAL_S3_BUCKETS', '').split(',') if bucket],
+  }
+  for key in params:
+    logger.info(str(key) + ':' + ' '*(40-len(str(key))) + str(params[key]))
+  return params
+
+def wait_until_ready(logger, name, probe, timeout):
+  """
+  Polls probe() until it succeeds or timeout seconds have passed
+
+  Args:
+    logger (logger): the logger object
+    name (string): the dependency name for logging
+    probe (callable): raises while the dependency is not ready
+    timeout (float): seconds to wait before giving up
+
+  Returns:
+    seconds until the dependency was ready, or None on timeout
+  """
+  start = time.monotonic()
+  last_error = None
+  while time.monotonic() - start < timeout:
+    try:
+      probe()
+      elapsed = time.monotonic() - start
+      logger.info(f'{name} ready after {elapsed:.2f}s')
+      return elapsed
+    except Exception as e:
+      last_error = e
+      time.sleep(PROBE_INTERVAL)
+  logger.error(f'{name} not ready after {timeout}s: {last_error}')
+  return None
+
+def probe_dynamodb(endpoint):
+  client = local_client('dynamodb', endpoint)
+  return lambda: client.list_tables(Limit=1)
+
+def probe_s3(endpoint):
+  client = local_client('s3', endpoint)
+  return lambda: client.list_buckets()
+
+def probe_app(port):
+  # docker's port proxy accepts connections before the app does, so wait
+  # for a real HTTP response (any status) instead of a TCP connect
+  def probe():
+    connection = http.client.HTTPConnection('localhost', port, timeout=2)
+    try:
+      connection.request('GET', '/')
+      connection.getresponse().read()
+    finally:
+      connection.close()
+  return probe
+
+def create_table(logger, endpoint, table):
+  """
+  Creates a DynamoDB table if it doesn't exist
+
+  Args:
+    logger (logger): the logger object
+    endpoint (string): the local DynamoDB endpoint
+    table (string): table[:hash key[:range key]], the hash key defaults to 'id'
+  """
+  parts = table.split(':')
+  table_name = parts[0]
+  keys = parts[1:] or ['id']
+  key_schema = [{'AttributeName': keys[0], 'KeyType': 'HASH'}]
+  if len(keys) > 1:
+    key_schema.append({'AttributeName': keys[1], 'KeyType': 'RANGE'})
+
+  client = local_client('dynamodb', endpoint)
+  try:
+    client.create_table(
+      TableName=table_name,
+      KeySchema=key_schema,
+      AttributeDefinitions=[{'AttributeName': key['AttributeName'], 'AttributeType': 'S'} for key in key_schema],
+      BillingMode='PAY_PER_REQUEST'
+    )
+    logger.info(f'Table created: {table_name}')
+  except client.exceptions.ResourceInUseException:
+    logger.info(f'Table {table_name} already exists')
+
+def create_bucket(logger, endpoint, bucket):
+  """
+  Creates an S3 bucket if it doesn't exist
+
+  Args:
+    logger (logger): the logger object
+    endpoint (string): the local S3 endpoint
+    bucket (string): the bucket name
+  """
+  client = local_client('s3', endpoint)
+  try:
+    client.create_bucket(Bucket=bucket)
+    logger.info(f'Bucket created: {bucket}')
+  except (client.exceptions.BucketAlreadyOwnedByYou, client.exceptions.BucketAlreadyExists):
+    logger.info(f'Bucket {bucket} already exists')
+
+def start_local_stack(logger, args):
+  """
+  Brings up the docker-compose stack, probes each dependency until it is ready
+  and creates the DynamoDB tables/S3 buckets in parallel
+
+  Args:
+    logger (logger): the logger object
+    args (argparse object): the local subcommand args (no_up/timeout)
+
+  Returns:
+    returns 0 on success, or -1 on failure
+  """
+  params = get_local_params(logger)
+  start = time.monotonic()
+
+  if not args.no_up:
+    try:
+      logger.info('Starting docker compose stack')
+      subprocess.run(['docker', 'compose', 'up', '-d'], check=True)
+    except Exception as e:
+      logger.critical(f'Error occured while starting docker compose: {e}')
+      return -1
+
+  probes = {
+    'dynamodb-local': probe_dynamodb(params['dynamodb_endpoint']),
+    's3mock': probe_s3(params['s3_endpoint']),
+    'app': probe_app(params['app_port']),
+  }
+  # tables/buckets are created as soon as their own dependency is ready
+  setup = {
+    'dynamodb-local': [(f'table {table}', create_table, params['dynamodb_endpoint'], table) for table in params['tables']],
+    's3mock': [(f'bucket {bucket}', create_bucket, params['s3_endpoint'], bucket) for bucket in params['buckets']],
+  }
+
+  ready = {}
+  setup_futures = []
+  with ThreadPoolExecutor(max_workers=len(probes)) as probe_executor, ThreadPoolExecutor(max_workers=16) as setup_executor:
+    futures = {probe_executor.submit(wait_until_ready, logger, name, probe, args.timeout): name for name, probe in probes.items()}
+    for future in as_completed(futures):
+      name = futures[future]
+      ready[name] = future.result()
+      if ready[name] is None:
+        continue
+      for resource_name, func, endpoint, resource in setup.get(name, []):
+        setup_futures.append((resource_name, setup_executor.submit(func, logger, endpoint, resource)))
+
+  errors = 0
+  for resource_name, future in setup_futures:
+    try:
+      future.result()
+    except Exception as e:
+      logger.error(f'Error creating {resource_name}: {e}')
+      errors += 1
+  total_setup = sum(len(resources) for resources in setup.values())
+
+  total = time.monotonic() - start
+  print('Time to ready:')
+  for name in probes:
+    elapsed = ready[name]
+    status = f'{elapsed:.2f}s' if elapsed is not None else f'NOT READY after {args.timeout}s'
+    print(f'  {name}:' + ' '*(20-len(name)) + status)
+  print(f'  tables/buckets:      {len(setup_futures) - errors}/{total_setup} created')
+  print(f'  total:               {total:.2f}s')
+
+  if errors or None in ready.values():
+    return -1
+  return 0
\ No newline at end of file
@@ -0,0 +1,243 @@
+import random
+import sys
+import threading
+import time
+
+try:
+  import boto3
+  from botocore.config import Config
+  from botocore.exceptions import ClientError
+  from botocore.exceptions import ConnectionClosedError
+  from botocore.exceptions import ConnectTimeoutError
+  from botocore.exceptions import EndpointConnectionError
+  from botocore.exceptions import ReadTimeoutError
+except ImportError as ie:
+  print(f'Error importing modules: {ie}')
+  print('Please make sure you have run `pip install -r requirements.txt`')
+  sys.exit(1)
+
+# error codes AWS uses to signal request throttling
+THROTTLE_CODES = {
+  'Throttling',
+  'ThrottlingException',
+  'ThrottledException',
+  'TooManyRequestsException',
+  'RequestLimitExceeded',
+  'RequestThrottled',
+  'RequestThrottledException',
+  'SlowDown',
+}
+
+# error codes for transient failures that botocore would otherwise have retried
+TRANSIENT_CODES = {
+  'RequestTimeout',
+  'RequestTimeoutException',
+  'PriorRequestNotComplete',
+  'InternalError',
+  'InternalFailure',
+  'ServiceUnavailable',
+  'ServerException',
+}
+TRANSIENT_ERRORS = (ConnectionClosedError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError)
+
+# per operation rate limits in requests/second
+INITIAL_RATE = 5.0
+MIN_RATE = 0.5
+MAX_RATE = 20.0
+BURST = 5.0
+# AIMD tuning: +ADDITIVE_INCREASE per success, *MULTIPLICATIVE_DECREASE per throttle
+ADDITIVE_INCREASE = 0.1
+MULTIPLICATIVE_DECREASE = 0.5
+MAX_RETRIES = 8
+# exponential backoff with full jitter for transient (5xx/connection) errors
+TRANSIENT_RETRIES = 4
+BACKOFF_BASE = 0.5
+MAX_BACKOFF = 20.0
+
+# botocore retries throttles itself; leave all retries to the scheduler instead
+CLIENT_CONFIG = Config(retries={'mode': 'standard', 'max_attempts': 1})
+
+class TokenBucket:
+  """
+  Token bucket for a single API operation with an AIMD adjusted rate
+  """
+  def __init__(self, rate=INITIAL_RATE, burst=BURST):
+    self.rate = rate
+    self.burst = burst
+    self.tokens = burst
+    self.last_refill = time.monotonic()
+    self.lock = threading.Lock()
+    self.calls = 0
+    self.throttles = 0
+    self.queue_delay = 0.0
+    self.max_queue_delay = 0.0
+
+  def _refill(self):
+    now = time.monotonic()
+    self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+    self.last_refill = now
+
+  def acquire(self):
+    """
+    Takes a token, sleeping until one is available
+
+    Returns:
+      the time spent waiting for the token in seconds
+    """
+    with self.lock:
+      self._refill()
+      # reserve the token now so concurrent callers queue up behind us
+      self.tokens -= 1
+      wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+      self.calls += 1
+      self.queue_delay += wait
+      self.max_queue_delay = max(self.max_queue_delay, wait)
+    if wait > 0:
+      time.sleep(wait)
+    return wait
+
+  def on_success(self):
+    with self.lock:
+      self.rate = min(MAX_RATE, self.rate + ADDITIVE_INCREASE)
+
+  def on_throttle(self):
+    with self.lock:
+      self._refill()
+      self.throttles += 1
+      self.rate = max(MIN_RATE, self.rate * MULTIPLICATIVE_DECREASE)
+      # drop the burst so the retry waits for the lower rate
+      self.tokens = min(self.tokens, 0.0)
+
+  def metrics(self):
+    with self.lock:
+      return {
+        'rate': round(self.rate, 2),
+        'calls': self.calls,
+        'throttles': self.throttles,
+        'avg_queue_delay': round(self.queue_delay / self.calls, 3) if self.calls else 0.0,
+        'max_queue_delay': round(self.max_queue_delay, 3),
+      }
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def get_bucket(service_name, operation):
+  """
+  Returns the shared token bucket for service_name/operation, creating it if needed
+
+  Args:
+    service_name (string): the AWS service, e.g. 'ecs'
+    operation (string): the API operation, e.g. 'DeleteService'
+  """
+  key = f'{service_name}:{operation}'
+  with _buckets_lock:
+    if key not in _buckets:
+      _buckets[key] = TokenBucket()
+    return _buckets[key]
+
+def is_throttle(error):
+  """
+  Checks whether a botocore ClientError is a throttling error
+  """
+  return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') in THROTTLE_CODES
+
+def is_transient(error):
+  """
+  Checks whether an error is a transient 5xx/timeout/connection failure worth retrying
+  """
+  if isinstance(error, TRANSIENT_ERRORS):
+    return True
+  if not isinstance(error, ClientError):
+    return False
+  status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+  return status >= 500 or error.response.get('Error', {}).get('Code') in TRANSIENT_CODES
+
+def call(service_name, operation, method, **kwargs):
+  """
+  Calls a client method through the operation's token bucket
+  Throttled calls reduce the rate and are retried up to MAX_RETRIES times
+  Transient 5xx/connection errors are retried up to TRANSIENT_RETRIES times with backoff
+
+  Args:
+    service_name (string): the AWS service, e.g. 'ecs'
+    operation (string): the API operation, e.g. 'DeleteService'
+    method (callable): the bound boto3 client method
+    kwargs: the arguments for the API call
+
+  Returns:
+    the API response
+  """
+  bucket = get_bucket(service_name, operation)
+  attempt = 0
+  transient_attempt = 0
+  while True:
+    bucket.acquire()
+    try:
+      response = method(**kwargs)
+    except (ClientError,) + TRANSIENT_ERRORS as e:
+      if is_throttle(e):
+        if attempt >= MAX_RETRIES:
+          raise
+        attempt += 1
+        bucket.on_throttle()
+        continue
+      if not is_transient(e) or transient_attempt >= TRANSIENT_RETRIES:
+        raise
+      transient_attempt += 1
+      time.sleep(random.uniform(0, min(MAX_BACKOFF, BACKOFF_BASE * 2 ** transient_attempt)))
+      continue
+    bucket.on_success()
+    return response
+
+class ScheduledClient:
+  """
+  Wraps a boto3 client so every API call goes through the shared scheduler
+  Non API attributes (exceptions, meta, get_paginator, ...) are passed through
+  """
+  def __init__(self, service_name, boto_client):
+    self._service_name = service_name
+    self._client = boto_client
+    self._operations = boto_client.meta.method_to_api_mapping
+
+  def __getattr__(self, name):
+    attr = getattr(self._client, name)
+    if name not in self._operations:
+      return attr
+    operation = self._operations[name]
+    def scheduled(**kwargs):
+      return call(self._service_name, operation, attr, **kwargs)
+    return scheduled
+
+def client(service_name, session=None, region_name='{{aws_region}}'):
+  """
+  Creates a boto3 client whose API calls are rate limited by the shared scheduler
+
+  Args:
+    service_name (string): the AWS service, e.g. 'ecs'
+    session (boto3.Session): optional session to create the client from
+    region_name (string): the AWS region
+
+  Returns:
+    the wrapped client
+  """
+  factory = session if session is not None else boto3
+  return ScheduledClient(service_name, factory.client(service_name, region_name=region_name, config=CLIENT_CONFIG))
+
+def get_metrics():
+  """
+  Returns the current rate, call/throttle counts and queueing delay per operation
+  """
+  with _buckets_lock:
+    buckets = dict(_buckets)
+  return {key: bucket.metrics() for key, bucket in buckets.items()}
+
+def log_metrics(logger):
+  """
+  Logs the scheduler metrics in an easier to read format
+
+  Args:
+    logger (logger): the logger object
+  """
+  for key, metrics in get_metrics().items():
+    line = str(key) + ':' + ' '*(40-len(str(key))) + ', '.join(f'{k}={v}' for k, v in metrics.items())
+    logger.info(line)
\ No newline at end of file
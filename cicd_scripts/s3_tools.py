@@ -0,0 +1,324 @@
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+  import boto3
+  from boto3.s3.transfer import TransferConfig
+  from botocore.config import Config
+  from dotenv import load_dotenv
+except ImportError as ie:
+  print(f'Error importing modules: {ie}')
+  print('Please make sure you have run `pip install -r requirements.txt`')
+  sys.exit(1)
+
+import local_stack
+
+DEFAULT_WORKERS = 8
+DEFAULT_FIXTURES_DIR = 's3-fixtures'
+# the ETag of a multipart upload depends on the part size, so uploads and
+# the local ETag calculation must use the same values
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+MULTIPART_CONCURRENCY = 4
+TRANSFER_CONFIG = TransferConfig(
+  multipart_threshold=MULTIPART_THRESHOLD,
+  multipart_chunksize=MULTIPART_CHUNKSIZE,
+  max_concurrency=MULTIPART_CONCURRENCY
+)
+
+def s3_client(args):
+  """
+  Creates an S3 client for s3mock (default), a custom endpoint, or AWS S3 with --aws
+
+  Args:
+    args (argparse object): the s3 subcommand args (endpoint/aws/workers)
+
+  Returns:
+    the boto3 S3 client
+  """
+  load_dotenv()
+  workers = getattr(args, 'workers', DEFAULT_WORKERS)
+  config = Config(
+    max_pool_connections=workers * MULTIPART_CONCURRENCY,
+    retries={'mode': 'standard', 'max_attempts': 5}
+  )
+  if args.aws:
+    return boto3.client('s3', region_name='{{aws_region}}', config=config)
+  # s3mock only supports path style bucket addressing
+  config = config.merge(Config(s3={'addressing_style': 'path'}))
+  endpoint = args.endpoint or os.getenv('LOCAL_S3_ENDPOINT', local_stack.DEFAULT_S3_ENDPOINT)
+  return local_stack.local_client('s3', endpoint, config=config)
+
+def split_s3_path(path):
+  """
+  Splits s3://bucket/prefix (the s3:// is optional) into (bucket, prefix)
+  """
+  if path.startswith('s3://'):
+    path = path[len('s3://'):]
+  bucket, _, prefix = path.partition('/')
+  return bucket, prefix
+
+def format_throughput(num_bytes, elapsed):
+  """
+  Formats a byte count and transfer rate, e.g. '1.50 GB in 12.3s (124.8 MB/s)'
+  """
+  def human(value):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+      if value < 1024:
+        return f'{value:.2f} {unit}'
+      value /= 1024
+    return f'{value:.2f} TB'
+  rate = num_bytes / elapsed if elapsed > 0 else 0
+  return f'{human(num_bytes)} in {elapsed:.1f}s ({human(rate)}/s)'
+
+def local_etag(path):
+  """
+  Calculates the ETag S3 reports for path when uploaded with TRANSFER_CONFIG
+  Single part uploads use the MD5 of the file, multipart uploads use the
+  MD5 of the concatenated part MD5s followed by -<number of parts>
+
+  Args:
+    path (string): the local file path
+
+  Returns:
+    the expected ETag string (without quotes)
+  """
+  whole = hashlib.md5()
+  parts = []
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(MULTIPART_CHUNKSIZE), b''):
+      whole.update(chunk)
+      parts.append(hashlib.md5(chunk).digest())
+  if os.path.getsize(path) < MULTIPART_THRESHOLD:
+    return whole.hexdigest()
+  return hashlib.md5(b''.join(parts)).hexdigest() + f'-{len(parts)}'
+
+def is_unchanged(path, remote):
+  """
+  Checks whether a local file matches a remote object by size, then ETag
+
+  Args:
+    path (string): the local file path
+    remote (dict): the remote object's 'size' and 'etag', or None if missing
+  """
+  if remote is None or not os.path.exists(path):
+    return False
+  if os.path.getsize(path) != remote['size']:
+    return False
+  return local_etag(path) == remote['etag']
+
+def iter_objects(client, bucket, prefix='', delimiter=None):
+  """
+  Streams the objects (and common prefixes with a delimiter) under a prefix page by page
+
+  Yields:
+    ('PRE', prefix) or ('OBJ', object dict) tuples
+  """
+  paginator = client.get_paginator('list_objects_v2')
+  kwargs = {'Bucket': bucket, 'Prefix': prefix}
+  if delimiter:
+    kwargs['Delimiter'] = delimiter
+  for page in paginator.paginate(**kwargs):
+    for common_prefix in page.get('CommonPrefixes', []):
+      yield 'PRE', common_prefix['Prefix']
+    for obj in page.get('Contents', []):
+      yield 'OBJ', obj
+
+def list_remote(client, bucket, prefix):
+  """
+  Returns {relative key: {'size', 'etag'}} for every object under prefix
+  """
+  remote = {}
+  for _, obj in iter_objects(client, bucket, prefix):
+    key = obj['Key'][len(prefix):]
+    # the prefix's own folder marker has no relative key
+    if not key:
+      continue
+    remote[key] = {'size': obj['Size'], 'etag': obj['ETag'].strip('"')}
+  return remote
+
+def list_local(directory):
+  """
+  Returns {relative key: path} for every file under directory
+  """
+  local = {}
+  for root, _, files in os.walk(directory):
+    for name in files:
+      path = os.path.join(root, name)
+      key = os.path.relpath(path, directory).replace(os.sep, '/')
+      local[key] = path
+  return local
+
+def s3_ls(logger, args):
+  """
+  Lists buckets, or the objects under s3://bucket/prefix, streaming each page as it arrives
+
+  Args:
+    logger (logger): the logger object
+    args (argparse object): the s3 ls args (path/recursive/endpoint/aws)
+
+  Returns:
+    returns 0 on success, or -1 on failure
+  """
+  client = s3_client(args)
+  try:
+    if not args.path:
+      for bucket in client.list_buckets()['Buckets']:
+        print(f'{bucket["CreationDate"]:%Y-%m-%d %H:%M:%S} {bucket["Name"]}')
+      return 0
+
+    bucket, prefix = split_s3_path(args.path)
+    if prefix and not prefix.endswith('/') and not args.recursive:
+      prefix += '/'
+    count = 0
+    total = 0
+    for kind, item in iter_objects(client, bucket, prefix, None if args.recursive else '/'):
+      if kind == 'PRE':
+        print(f'{"PRE":>30} {item[len(prefix):]}')
+      else:
+        count += 1
+        total += item['Size']
+        print(f'{item["LastModified"]:%Y-%m-%d %H:%M:%S} {item["Size"]:>10} {item["Key"][len(prefix):]}')
+    logger.info(f'{count} objects, {total} bytes')
+  except Exception as e:
+    logger.error(f'Error listing {args.path}: {e}')
+    return -1
+  return 0
+
+def sync(logger, client, source, destination, workers):
+  """
+  Syncs a local directory to s3://bucket/prefix or the other way around
+  Files with the same size and ETag on both sides are skipped, the rest are
+  transferred in parallel using multipart transfers for large files
+
+  Args:
+    logger (logger): the logger object
+    client (boto3 client): the S3 client
+    source (string): local directory or s3://bucket/prefix
+    destination (string): local directory or s3://bucket/prefix
+    workers (int): number of files to transfer in parallel
+
+  Returns:
+    a (transferred, skipped, failed, bytes) tuple
+  """
+  upload = destination.startswith('s3://')
+  if upload == source.startswith('s3://'):
+    raise ValueError('sync needs exactly one local directory and one s3:// path')
+
+  if upload:
+    bucket, prefix = split_s3_path(destination)
+    local_dir = source
+    local = list_local(local_dir)
+  else:
+    bucket, prefix = split_s3_path(source)
+    local_dir = destination
+  prefix = prefix.rstrip('/')
+  remote = list_remote(client, bucket, f'{prefix}/' if prefix else '')
+  if upload:
+    keys = list(local)
+  else:
+    # keys ending in / are folder markers, not files
+    keys = [key for key in remote if not key.endswith('/')]
+  local_root = os.path.realpath(local_dir)
+
+  def object_key(key):
+    return f'{prefix}/{key}' if prefix else key
+
+  def transfer(key):
+    path = os.path.join(local_dir, *key.split('/'))
+    # keys like a//b or /a would collapse onto another file's path
+    if not upload and '' in key.split('/'):
+      raise ValueError(f'{key} has an empty path segment')
+    # don't let keys like ../x write outside the target directory
+    if not upload and os.path.commonpath([local_root, os.path.realpath(path)]) != local_root:
+      raise ValueError(f'{key} resolves outside {local_dir}')
+    if is_unchanged(path, remote.get(key)):
+      return None
+    if upload:
+      logger.debug(f'Uploading {path} to s3://{bucket}/{object_key(key)}')
+      client.upload_file(path, bucket, object_key(key), Config=TRANSFER_CONFIG)
+    else:
+      logger.debug(f'Downloading s3://{bucket}/{object_key(key)} to {path}')
+      os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+      client.download_file(bucket, object_key(key), path, Config=TRANSFER_CONFIG)
+    return os.path.getsize(path)
+
+  transferred = skipped = failed = num_bytes = 0
+  with ThreadPoolExecutor(max_workers=workers) as executor:
+    futures = {key: executor.submit(transfer, key) for key in keys}
+    for key, future in futures.items():
+      try:
+        size = future.result()
+      except Exception as e:
+        logger.error(f'Error syncing {key}: {e}')
+        failed += 1
+        continue
+      if size is not None:
+        transferred += 1
+        num_bytes += size
+      else:
+        skipped += 1
+  return transferred, skipped, failed, num_bytes
+
+def s3_sync(logger, args):
+  """
+  Syncs args.source to args.destination and reports the throughput
+
+  Args:
+    logger (logger): the logger object
+    args (argparse object): the s3 sync args (source/destination/workers/endpoint/aws)
+
+  Returns:
+    returns 0 on success, or -1 on failure
+  """
+  client = s3_client(args)
+  start = time.monotonic()
+  try:
+    transferred, skipped, failed, num_bytes = sync(logger, client, args.source, args.destination, args.workers)
+  except Exception as e:
+    logger.error(f'Error syncing {args.source} to {args.destination}: {e}')
+    return -1
+  print(f'{transferred} transferred, {skipped} unchanged, {failed} failed: {format_throughput(num_bytes, time.monotonic() - start)}')
+  return -1 if failed else 0
+
+def s3_seed(logger, args):
+  """
+  Seeds local fixtures: every subdirectory of args.directory is created as a
+  bucket and synced into it, e.g. s3-fixtures/my-bucket/... -> s3://my-bucket/...
+
+  Args:
+    logger (logger): the logger object
+    args (argparse object): the s3 seed args (directory/workers/endpoint/aws)
+
+  Returns:
+    returns 0 on success, or -1 on failure
+  """
+  client = s3_client(args)
+  directory = args.directory or os.getenv('S3_FIXTURES_DIR', DEFAULT_FIXTURES_DIR)
+  if not os.path.isdir(directory):
+    logger.error(f'Fixtures directory not found: {directory}')
+    return -1
+
+  buckets = [name for name in sorted(os.listdir(directory)) if os.path.isdir(os.path.join(directory, name))]
+  logger.info(f'Seeding buckets: {buckets}')
+  start = time.monotonic()
+  totals = [0, 0, 0, 0]
+  for bucket in buckets:
+    try:
+      client.create_bucket(Bucket=bucket)
+      logger.info(f'Bucket created: {bucket}')
+    except (client.exceptions.BucketAlreadyOwnedByYou, client.exceptions.BucketAlreadyExists):
+      logger.info(f'Bucket {bucket} already exists')
+    except Exception as e:
+      logger.error(f'Error creating bucket {bucket}: {e}')
+      totals[2] += 1
+      continue
+    # buckets are synced one after another, each with args.workers parallel transfers
+    result = sync(logger, client, os.path.join(directory, bucket), f's3://{bucket}', args.workers)
+    totals = [total + value for total, value in zip(totals, result)]
+  transferred, skipped, failed, num_bytes = totals
+  print(f'{len(buckets)} buckets, {transferred} transferred, {skipped} unchanged, {failed} failed: {format_throughput(num_bytes, time.monotonic() - start)}')
+  return -1 if failed else 0
\ No newline at end of file
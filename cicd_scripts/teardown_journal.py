@@ -0,0 +1,134 @@
+import json
+import os
+import time
+
+# journals live next to cicd_log.txt so they survive between runs
+JOURNAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'journals')
+
+def journal_path(name):
+  """
+  Builds the path of the journal file for a cluster (or stopall run)
+
+  Args:
+    name (string): the cluster name or journal name
+
+  Returns:
+    the path to the journal file
+  """
+  safe_name = name.replace('/', '_').replace(':', '_')
+  return os.path.join(JOURNAL_DIR, f'{safe_name}.jsonl')
+
+def open_journal(logger, name, resume=False):
+  """
+  Opens the append-only teardown journal for name
+  Without resume any previous journal is discarded and a fresh one is started
+
+  Args:
+    logger (logger): the logger object
+    name (string): the cluster name or journal name
+    resume (bool): load the completed steps from a previous run
+
+  Returns:
+    a journal dict with the 'name', 'path' and completed 'entries'
+  """
+  path = journal_path(name)
+  journal = {'name': name, 'path': path, 'entries': {}}
+
+  if not resume:
+    if os.path.exists(path):
+      logger.debug(f'Discarding previous journal: {path}')
+      os.remove(path)
+    return journal
+
+  if not os.path.exists(path):
+    logger.info(f'No journal found for {name}, starting from the beginning')
+    return journal
+
+  with open(path, 'r') as f:
+    for line in f:
+      line = line.strip()
+      if not line:
+        continue
+      try:
+        entry = json.loads(line)
+      except ValueError:
+        # a partially written last line from an interrupted run
+        logger.warning(f'Ignoring malformed journal line in {path}: {line}')
+        continue
+      journal['entries'][(entry['step'], entry.get('resource', ''))] = entry.get('data')
+  logger.info(f'Resuming {name} with {len(journal["entries"])} completed steps')
+  return journal
+
+def get_journal(logger, params):
+  """
+  Returns the journal for params['cluster_name'], opening it if needed
+
+  Args:
+    logger (logger): the logger object
+    params (dict): the configuration/env params with username/cluster_name/etc
+
+  Returns:
+    the journal dict for the current cluster
+  """
+  journal = params.get('journal')
+  if journal is None or journal['name'] != params['cluster_name']:
+    journal = open_journal(logger, params['cluster_name'], params.get('resume', False))
+    params['journal'] = journal
+  return journal
+
+def is_done(journal, step, resource=''):
+  """
+  Checks whether a step was already completed
+
+  Args:
+    journal (dict): the journal dict
+    step (string): the step name, e.g. 'service_deleted'
+    resource (string): the resource the step applies to, e.g. a service ARN
+
+  Returns:
+    True if the step is recorded in the journal
+  """
+  return (step, resource) in journal['entries']
+
+def get_data(journal, step, resource=''):
+  """
+  Returns the data recorded with a completed step, or None
+
+  Args:
+    journal (dict): the journal dict
+    step (string): the step name
+    resource (string): the resource the step applies to
+  """
+  return journal['entries'].get((step, resource))
+
+def record_step(logger, journal, step, resource='', data=None):
+  """
+  Appends a completed step to the journal and flushes it to disk
+
+  Args:
+    logger (logger): the logger object
+    journal (dict): the journal dict
+    step (string): the step name, e.g. 'service_deleted'
+    resource (string): the resource the step applies to, e.g. a service ARN
+    data (json serializable): extra data needed to resume, e.g. a list of ARNs
+  """
+  entry = {'time': time.time(), 'step': step, 'resource': resource, 'data': data}
+  os.makedirs(JOURNAL_DIR, exist_ok=True)
+  with open(journal['path'], 'a') as f:
+    f.write(json.dumps(entry) + '\n')
+    f.flush()
+    os.fsync(f.fileno())
+  journal['entries'][(step, resource)] = data
+  logger.debug(f'Journal {journal["name"]}: {step} {resource}')
+
+def close_journal(logger, journal):
+  """
+  Removes the journal once the teardown has completed
+
+  Args:
+    logger (logger): the logger object
+    journal (dict): the journal dict
+  """
+  if os.path.exists(journal['path']):
+    os.remove(journal['path'])
+  logger.debug(f'Teardown of {journal["name"]} complete, journal removed')
\ No newline at end of file
@@ -7,9 +7,16 @@ script_dir = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(os.path.join(script_dir, 'cicd_scripts'))
 
 from cicd_scripts import launch_utils
+from cicd_scripts.bench import run_bench
 from cicd_scripts.delete_cluster import delete_cluster
 from cicd_scripts.delete_cluster import delete_all_clusters
 from cicd_scripts.launch_cluster import launch_cluster
+from cicd_scripts.local_stack import start_local_stack
+from cicd_scripts.s3_tools import s3_ls
+from cicd_scripts.s3_tools import s3_seed
+from cicd_scripts.s3_tools import s3_sync
+# imported from cicd_scripts/ on sys.path so the scheduler is shared with the cicd modules
+import rate_scheduler
 
 if __name__ == "__main__":
   parser = argparse.ArgumentParser(description="Script for Launcing an ECS Cluster/Service/Task from an ECR Image from a Docker container")
@@ -19,17 +26,54 @@ if __name__ == "__main__":
   parser_start = subparsers.add_parser('start', help='start a task')
   parser_stop = subparsers.add_parser('stop', help='stop a task')
   parser_stopall = subparsers.add_parser('stopall', help='stop all tasks')
+  parser_local = subparsers.add_parser('local', help='start the local docker compose stack and wait until it is ready')
+  parser_s3 = subparsers.add_parser('s3', help='list/sync/seed s3mock (or S3 with --aws)')
+  parser_bench = subparsers.add_parser('bench', help='load test the container and report throughput/latency')
   
-  for subparser in [parser_start, parser_stop, parser_stopall]:
+  s3_subparsers = parser_s3.add_subparsers(dest='s3_command', required=True)
+  parser_s3_ls = s3_subparsers.add_parser('ls', help='list buckets or objects')
+  parser_s3_sync = s3_subparsers.add_parser('sync', help='sync a local directory and an s3:// path (either direction)')
+  parser_s3_seed = s3_subparsers.add_parser('seed', help='create a bucket per fixtures subdirectory and sync it')
+  
+  for subparser in [parser_start, parser_stop, parser_stopall, parser_local, parser_s3_ls, parser_s3_sync, parser_s3_seed, parser_bench]:
     subparser.add_argument('-t', '--test', action='store_true', help='Run in test mode')
     subparser.add_argument('-v', '--verbose', action='count', help='Show debug messages')
     
+  parser_start.add_argument('-p', '--profile', help='task sizing profile, e.g. small/medium/large/xlarge (default: TASK_PROFILE in .env)')
+  parser_start.add_argument('-a', '--autoscale', choices=['cpu', 'requests'], help='register target tracking autoscaling on cpu or ALB request count')
+  parser_start.add_argument('--arch', choices=['X86_64', 'ARM64'], help='CPU architecture for the task (default: CPU_ARCHITECTURE in .env or X86_64). The image is built for IMAGE_PLATFORMS with docker buildx')
+  parser_start.add_argument('--capacity-providers', help='capacity provider strategy, e.g. FARGATE:1:1,FARGATE_SPOT:4 (provider:weight[:base])')
   parser_start.add_argument('-k', '--keep-alive', action='store_true', help='add tag to keep this task alive. requires the --force option to stop it')
   
   parser_stop.add_argument('-c', '--cluster', help="Name of Cluster to stop")
   
   for subparser in [parser_stop, parser_stopall]:
     subparser.add_argument('-f', '--force', action='store_true', help='force stop task')
+    subparser.add_argument('-r', '--resume', action='store_true', help='resume an interrupted stop, skipping completed steps')
+  
+  parser_local.add_argument('--no-up', action='store_true', help='skip `docker compose up`, only probe/create tables and buckets')
+  parser_local.add_argument('--timeout', type=float, default=120, help='seconds to wait for each dependency (default: 120)')
+  
+  for subparser in [parser_s3_ls, parser_s3_sync, parser_s3_seed]:
+    subparser.add_argument('--endpoint', help='S3 endpoint (default: LOCAL_S3_ENDPOINT in .env or http://localhost:9090)')
+    subparser.add_argument('--aws', action='store_true', help='use AWS S3 instead of the local endpoint')
+  
+  for subparser in [parser_s3_sync, parser_s3_seed]:
+    subparser.add_argument('-w', '--workers', type=int, default=8, help='number of files to transfer in parallel (default: 8)')
+  
+  parser_s3_ls.add_argument('path', nargs='?', help='s3://bucket/prefix, lists buckets if omitted')
+  parser_s3_ls.add_argument('-r', '--recursive', action='store_true', help='list every object under the prefix')
+  parser_s3_sync.add_argument('source', help='local directory or s3://bucket/prefix')
+  parser_s3_sync.add_argument('destination', help='local directory or s3://bucket/prefix')
+  parser_bench.add_argument('url', nargs='?', help='target URL (default: the local compose app on port 80)')
+  parser_bench.add_argument('-c', '--concurrency', type=int, default=10, help='number of concurrent connections (default: 10)')
+  parser_bench.add_argument('-d', '--duration', type=float, default=10, help='seconds to run for (default: 10)')
+  parser_bench.add_argument('-n', '--requests', type=int, help='stop after this many requests')
+  parser_bench.add_argument('--timeout', type=float, default=10, help='per request timeout in seconds (default: 10)')
+  parser_bench.add_argument('-l', '--label', help='label stored with the results, e.g. the task profile (default: local, or TASK_PROFILE in .env and the host for a url)')
+  parser_bench.add_argument('-o', '--output', help='results file (default: BENCH_RESULTS_FILE in .env or bench_results.jsonl)')
+  parser_bench.add_argument('--compare', action='store_true', help='print the stored runs side by side and exit')
+  parser_s3_seed.add_argument('directory', nargs='?', help='fixtures directory with one subdirectory per bucket (default: S3_FIXTURES_DIR in .env or s3-fixtures)')
     
   args = parser.parse_args()
   
@@ -37,6 +81,25 @@ if __name__ == "__main__":
     args = parser.parse_args(['start'])
   
   logger = launch_utils.config_logger(args)
+  
+  # local commands don't need the AWS params
+  if args.command == 'local':
+    if args.test:
+      print('Test run exiting')
+      sys.exit(0)
+    sys.exit(0 if start_local_stack(logger, args) == 0 else 1)
+  elif args.command == 's3':
+    if args.test:
+      print('Test run exiting')
+      sys.exit(0)
+    s3_commands = {'ls': s3_ls, 'sync': s3_sync, 'seed': s3_seed}
+    sys.exit(0 if s3_commands[args.s3_command](logger, args) == 0 else 1)
+  elif args.command == 'bench':
+    if args.test:
+      print('Test run exiting')
+      sys.exit(0)
+    sys.exit(0 if run_bench(logger, args) == 0 else 1)
+  
   params = launch_utils.get_params(logger, args)
   
   # add keep_alive/force support
@@ -45,12 +108,18 @@ if __name__ == "__main__":
     print('Test run exiting')
     sys.exit(0)
   
+  result = 0
   if args.command == 'start':
     launch_cluster(logger, params)
   elif args.command == 'stop':
-    delete_cluster(logger, params)
+    result = delete_cluster(logger, params)
   elif args.command == 'stopall':
-    delete_all_clusters(logger, params)
+    result = delete_all_clusters(logger, params)
   else:
     print('Unknown command')
+    sys.exit(1)
+  
+  rate_scheduler.log_metrics(logger)
+  # an incomplete teardown leaves its journal open for --resume; fail the CI step
+  if result == -1:
     sys.exit(1)
\ No newline at end of file